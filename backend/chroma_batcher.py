@@ -0,0 +1,83 @@
+import threading
+import logging
+
+class ChromaBatcher:
+    """
+    Accumulates ChromaDB writes client-side and flushes them with a single collection.upsert call,
+    either once batch_size items are queued or flush_interval seconds after the first queued item.
+    The collection is resolved through get_collection on every write, so ChromaDB may come up later;
+    a batch that fails to write is put back and retried on the next flush.
+    """
+    def __init__(self, get_collection, batch_size: int = 100, flush_interval: float = 2.0, logger=None):
+        self.get_collection = get_collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._ids = []
+        self._embeddings = []
+        self._documents = []
+        self._metadatas = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            self._ids.extend(ids)
+            self._embeddings.extend(embeddings)
+            self._documents.extend(documents)
+            self._metadatas.extend(metadatas)
+            if len(self._ids) >= self.batch_size:
+                batch = self._drain()
+            else:
+                batch = None
+                self._arm_timer()
+        if batch:
+            self._write(batch)
+
+    def _arm_timer(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            batch = self._drain()
+        if batch:
+            self._write(batch)
+
+    def _drain(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._ids:
+            return None
+        # upsert rejects repeated ids within one call; the latest write of an id wins
+        last = {item_id: i for i, item_id in enumerate(self._ids)}
+        if len(last) < len(self._ids):
+            keep = sorted(last.values())
+            self._ids, self._embeddings, self._documents, self._metadatas = (
+                [items[i] for i in keep] for items in (self._ids, self._embeddings, self._documents, self._metadatas)
+            )
+        batch = {
+            "ids": self._ids,
+            "embeddings": self._embeddings,
+            "documents": self._documents,
+            "metadatas": self._metadatas
+        }
+        self._ids, self._embeddings, self._documents, self._metadatas = [], [], [], []
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.get_collection().upsert(**batch)
+            self.logger.info(f"Flushed {len(batch['ids'])} items to ChromaDB")
+        except Exception as e:
+            self.logger.error(f"ChromaDB batch write error, keeping {len(batch['ids'])} items for retry: {e}")
+            with self._lock:
+                # Older than anything queued since, so it goes first and newer writes of an id still win
+                self._ids[:0] = batch["ids"]
+                self._embeddings[:0] = batch["embeddings"]
+                self._documents[:0] = batch["documents"]
+                self._metadatas[:0] = batch["metadatas"]
+                self._arm_timer()
@@ -1,24 +1,46 @@
 import chromadb
 import os
 
-# Create the ChromaDB HTTP client
-chroma_client = chromadb.HttpClient(
-    host=os.getenv('CHROMA_HOST', 'localhost'),
-    port=int(os.getenv('CHROMA_PORT', '8000'))
-)
+_chroma_client = None
+_schema_collection = None
 
-# collections = chroma_client.list_collections()
+def get_chroma_client():
+    """
+    Returns the process-wide ChromaDB HTTP client, creating it on first use.
+    """
+    global _chroma_client
+    if _chroma_client is None:
+        _chroma_client = chromadb.HttpClient(
+            host=os.getenv('CHROMA_HOST', 'localhost'),
+            port=int(os.getenv('CHROMA_PORT', '8000'))
+        )
+    return _chroma_client
 
-# for collection in collections:
-#     print(collection.get(collection.name))
+def get_schema_collection():
+    """
+    Returns the "db_schema" collection holding the schema and feedback embeddings, creating it on first use.
+    """
+    global _schema_collection
+    if _schema_collection is None:
+        _schema_collection = get_chroma_client().get_or_create_collection(
+            name="db_schema",
+            metadata={"description": "SQL query examples for training"}
+        )
+    return _schema_collection
 
-# Access an existing collection (e.g., "sql_examples")
-collection = chroma_client.get_collection("db_schema")
+if __name__ == "__main__":
+    # collections = get_chroma_client().list_collections()
 
-# Example: Read all document IDs in the collection
-result = collection.get()
-print(result)
+    # for collection in collections:
+    #     print(collection.get(collection.name))
+
+    # Access the existing "db_schema" collection
+    collection = get_schema_collection()
+
+    # Health check: count the items and peek at one instead of fetching everything
+    print(f"db_schema contains {collection.count()} items")
+    print(collection.get(limit=1))
 
 
 #Test command to run this script in the Docker container:
-# docker-compose exec fastapi python chroma_client.py
\ No newline at end of file
+# docker-compose exec fastapi python chroma_client.py
@@ -1,79 +1,195 @@
 import os
-import requests
+import hashlib
+import logging
+import httpx
+import numpy as np
+import orjson
 from datetime import datetime
-from mysql.connector import Error
+from itertools import groupby
+from operator import itemgetter
+from ollama_session import session, JSON_HEADERS
+
+# All columns of the current database in one round-trip, aliased to match DESCRIBE output
+SCHEMA_COLUMNS_QUERY = """
+    SELECT table_name AS table_name, column_name AS `Field`, column_type AS `Type`,
+           is_nullable AS `Null`, column_key AS `Key`, column_default AS `Default`, extra AS `Extra`
+    FROM information_schema.columns
+    WHERE table_schema = DATABASE()
+    ORDER BY table_name, ordinal_position
+"""
+
+## Function to read the columns of every table with a single information_schema query
+def fetch_schema_tables(connection):
+    """
+    Returns {table_name: [column, ...]} where each column has the same keys as a DESCRIBE row.
+    """
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(SCHEMA_COLUMNS_QUERY)
+    rows = cursor.fetchall()
+    cursor.close()
+    return {
+        table_name: [{key: value for key, value in row.items() if key != "table_name"} for row in columns]
+        for table_name, columns in groupby(rows, key=itemgetter("table_name"))
+    }
 
 ## Function to read MySQL schema, tokenize it, create a vector embedding using Ollama, and store it in ChromaDB
-def embed_and_store_schema(chroma_client, get_mysql_connection, logger):
+def embed_and_store_schema(get_chroma_client, tables, logger):
     """
-    Reads MySQL schema, tokenizes it, creates a vector embedding using Ollama, and stores it in ChromaDB.
-    Should be called only at backend application startup.
+    Formats the MySQL schema read by fetch_schema_tables, creates a vector embedding using Ollama, and stores it in ChromaDB.
+    Called at backend application startup and whenever the schema changes.
+    Returns the formatted schema text so callers can cache it as prompt context.
     """
+    # Build each chunk from a list of lines joined once, not by repeated string concatenation
+    table_chunks = {}
+    for table_name, columns in tables.items():
+        parts = [f"Table: {table_name}"]
+        parts.extend(f"  - {column['Field']} ({column['Type']})" for column in columns)
+        parts.append("")
+        table_chunks[table_name] = "\n".join(parts)
+    # The prompt context does not depend on ChromaDB, so it is returned even if embedding fails
+    schema_text = "".join(table_chunks.values())
+    if not table_chunks:
+        logger.info("No tables found in MySQL schema, skipping embedding")
+        return schema_text
+
     try:
-        collection = chroma_client.get_or_create_collection(
+        collection = get_chroma_client().get_or_create_collection(
             name="db_schema",
             metadata={"description": "Vector embedding of MySQL schema"}
         )
         logger.info("ChromaDB schema collection ready")
 
-        connection = get_mysql_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
-
-        schema_text = ""
-        for table in tables:
-            table_name = list(table.values())[0]
-            cursor.execute(f"DESCRIBE {table_name}")
-            columns = cursor.fetchall()
-            schema_text += f"Table: {table_name}\n"
-            for column in columns:
-                schema_text += f"  - {column['Field']} ({column['Type']})\n"
-            
-        # Tokenize and embed schema text using Ollama
-        schema_embedding = get_ollama_embedding(schema_text, logger=logger)
+        # Skip re-embedding when the stored schema was built from the same text and model
+        schema_hash = hashlib.sha256(schema_text.encode()).hexdigest()
+        _, model = _ollama_embedding_config()
+        stored = collection.get(where={"type": {"$in": ["schema", "schema_table"]}}, include=["metadatas"])
+        stored_metadata = dict(zip(stored['ids'], stored['metadatas']))
+        schema_metadata = stored_metadata.get("mysql_schema") or {}
+        if schema_metadata.get("schema_hash") == schema_hash and schema_metadata.get("embedding_model") == model:
+            logger.info("MySQL schema unchanged since last embedding, skipping Ollama call.")
+            return schema_text
+
+        # Embed every table chunk in a single batched Ollama request
+        table_names = list(table_chunks)
+        table_embeddings = get_ollama_embeddings([table_chunks[t] for t in table_names], model=model, logger=logger)
+        # The full schema document keeps the centroid of its table embeddings
+        schema_embedding = table_embeddings.mean(axis=0)
         logger.info(f"MySQL schema embedding Type : {type(schema_embedding)}")
-        # Remove old if exists
-        try:
-            collection.delete(ids=["mysql_schema"])
-        except Exception:
-            pass
-
-        collection.add( 
-            embeddings=[schema_embedding],
-            documents=[schema_text],
-            metadatas=[{"type": "schema", "timestamp": datetime.now().isoformat()}],
-            ids=["mysql_schema"]
-        )
-        logger.info("MySQL schema embedded and stored in ChromaDB.")
 
-        cursor.close()
-        connection.close()
-    except Error as e:
-        logger.error(f"Schema embedding error: {e}")
+        table_ids = [f"mysql_schema_table_{t}" for t in table_names]
+        # Remove chunks of tables that no longer exist
+        stale_ids = [doc_id for doc_id in stored_metadata if doc_id != "mysql_schema" and doc_id not in table_ids]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+
+        timestamp = datetime.now().isoformat()
+        collection.upsert(
+            embeddings=[schema_embedding, *table_embeddings],
+            documents=[schema_text] + [table_chunks[t] for t in table_names],
+            metadatas=[{"type": "schema", "schema_hash": schema_hash, "embedding_model": model, "timestamp": timestamp}]
+                + [{"type": "schema_table", "table_name": t, "timestamp": timestamp} for t in table_names],
+            ids=["mysql_schema"] + table_ids
+        )
+        logger.info(f"MySQL schema embedded and stored in ChromaDB ({len(table_names)} tables).")
     except Exception as e:  
         logger.error(f"Unexpected error during schema embedding: {e}")
+    return schema_text
+
+## Function to fingerprint the MySQL schema so changes can be detected cheaply
+def get_schema_fingerprint(tables):
+    """
+    Returns an md5 digest over every table/column/type returned by fetch_schema_tables.
+    """
+    digest = hashlib.md5()
+    for table_name, columns in tables.items():
+        for column in columns:
+            digest.update(repr((table_name, column['Field'], column['Type'])).encode())
+    return digest.hexdigest()
         
-## Function to get Ollama embedding for a given text
-def get_ollama_embedding(text, ollama_host=None, ollama_port=None, model=None, logger=None):
+def _ollama_embedding_config(ollama_host=None, ollama_port=None, model=None):
     ollama_host = ollama_host or os.getenv('OLLAMA_HOST', 'localhost')
     ollama_port = ollama_port or os.getenv('OLLAMA_PORT', '11434')
     model = model or os.getenv('EMBEDDING_MODEL', 'nomic-embed-text')
-    url = f"http://{ollama_host}:{ollama_port}/api/embeddings"
-    payload = {
-        "model": model,
-        "prompt": text
-    }
+    return f"http://{ollama_host}:{ollama_port}", model
+
+def _embed_request(base_url, model, texts, logger=None):
+    url = f"{base_url}/api/embed"
+    if logger and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sending embedding request to %s (%d texts, %d chars)", url, len(texts), sum(map(len, texts)))
+    return url, orjson.dumps({"model": model, "input": texts})
+
+def _parse_embed_response(response, logger=None):
+    """Returns the embeddings array, or None when the server needs the legacy endpoint"""
+    if response.status_code != 404:
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        if result.get("embeddings"):
+            return result["embeddings"]
+    if logger:
+        logger.info("Ollama /api/embed unavailable, falling back to /api/embeddings")
+    return None
+
+def _legacy_embed_request(base_url, model, text):
+    return f"{base_url}/api/embeddings", orjson.dumps({"model": model, "prompt": text})
+
+def _parse_legacy_embed_response(response):
+    response.raise_for_status()
+    return orjson.loads(response.content)["embedding"]
+
+## Function to get Ollama embeddings for a batch of texts in a single request
+def get_ollama_embeddings(texts, ollama_host=None, ollama_port=None, model=None, logger=None):
+    """
+    Embeds all texts with one call to Ollama's /api/embed endpoint.
+    Falls back to one legacy /api/embeddings call per text when the server
+    does not return an `embeddings` array.
+    Returns a float32 matrix with one row per text.
+    """
+    base_url, model = _ollama_embedding_config(ollama_host, ollama_port, model)
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
     try:
+        url, body = _embed_request(base_url, model, texts, logger)
+        embeddings = _parse_embed_response(session.post(url, data=body, headers=JSON_HEADERS, timeout=30), logger)
+        if embeddings is None:
+            embeddings = []
+            for text in texts:
+                url, body = _legacy_embed_request(base_url, model, text)
+                embeddings.append(_parse_legacy_embed_response(session.post(url, data=body, headers=JSON_HEADERS, timeout=30)))
+        return np.asarray(embeddings, dtype=np.float32)
+    except Exception as e:
         if logger:
-            logger.info(f"\n Sending embedding request to {url} with payload: {payload}")
-        response = requests.post(url, json=payload, timeout=30)
-        # if logger:
-        #     logger.info(f"\n Ollama embedding response: {response.status_code} {response.text}")
-        response.raise_for_status()
-        result = response.json()
-        return result["embedding"]
+            logger.error(f"Ollama embedding error: {e}")
+        raise
+
+## Function to get Ollama embedding for a given text
+def get_ollama_embedding(text, ollama_host=None, ollama_port=None, model=None, logger=None):
+    return get_ollama_embeddings([text], ollama_host, ollama_port, model, logger)[0]
+
+## Async variant of get_ollama_embeddings for FastAPI request handlers
+async def get_ollama_embeddings_async(http_client: httpx.AsyncClient, texts, ollama_host=None, ollama_port=None, model=None, logger=None):
+    """
+    Same as get_ollama_embeddings, but awaits the shared httpx.AsyncClient
+    instead of blocking the event loop.
+    """
+    base_url, model = _ollama_embedding_config(ollama_host, ollama_port, model)
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    try:
+        url, body = _embed_request(base_url, model, texts, logger)
+        embeddings = _parse_embed_response(await http_client.post(url, content=body, headers=JSON_HEADERS, timeout=30), logger)
+        if embeddings is None:
+            embeddings = []
+            for text in texts:
+                url, body = _legacy_embed_request(base_url, model, text)
+                embeddings.append(_parse_legacy_embed_response(await http_client.post(url, content=body, headers=JSON_HEADERS, timeout=30)))
+        return np.asarray(embeddings, dtype=np.float32)
     except Exception as e:
         if logger:
             logger.error(f"Ollama embedding error: {e}")
-        raise
\ No newline at end of file
+        raise
+
+## Async variant of get_ollama_embedding
+async def get_ollama_embedding_async(http_client: httpx.AsyncClient, text, ollama_host=None, ollama_port=None, model=None, logger=None):
+    return (await get_ollama_embeddings_async(http_client, [text], ollama_host, ollama_port, model, logger))[0]
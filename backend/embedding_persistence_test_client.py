@@ -2,25 +2,56 @@ import os
 import requests
 import chromadb
 import logging
+from ollama_session import session
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_ollama_embedding(text: str, ollama_host: str, ollama_port: str, model: str = 'nomic-embed-text') -> list[float]:
+_chroma_client = None
+
+def get_chroma_client():
     """
-    Generates an embedding for the given text using the Ollama service.
+    Returns a single cached ChromaDB HTTP client for the whole script.
+    """
+    global _chroma_client
+    if _chroma_client is None:
+        chroma_host = os.getenv('CHROMA_HOST', 'localhost')
+        chroma_port = int(os.getenv('CHROMA_PORT', '8000'))
+        logger.info(f"Connecting to ChromaDB at {chroma_host}:{chroma_port}...")
+        _chroma_client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
+    return _chroma_client
+
+def get_ollama_embeddings(texts: list[str], ollama_host: str, ollama_port: str, model: str = 'nomic-embed-text') -> list[list[float]]:
     """
-    url = f"http://{ollama_host}:{ollama_port}/api/embeddings"
-    payload = {"model": model, "prompt": text}
+    Generates embeddings for all given texts in a single request to the Ollama /api/embed endpoint.
+    Falls back to sequential /api/embeddings calls when the server does not return an `embeddings` array.
+    """
+    url = f"http://{ollama_host}:{ollama_port}/api/embed"
+    payload = {"model": model, "input": texts}
     try:
-        logger.info(f"Sending embedding request to {url} with payload: {payload}")
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
-        logger.info("Successfully generated embedding.")
-        return result["embedding"]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending embedding request to %s (%d texts, %d chars)", url, len(texts), sum(map(len, texts)))
+        response = session.post(url, json=payload, timeout=30)
+        if response.status_code != 404:
+            response.raise_for_status()
+            result = response.json()
+            if result.get("embeddings"):
+                logger.info(f"Successfully generated {len(result['embeddings'])} embeddings.")
+                return result["embeddings"]
+        logger.info("Ollama /api/embed unavailable, falling back to /api/embeddings")
+        embeddings = []
+        for text in texts:
+            response = session.post(
+                f"http://{ollama_host}:{ollama_port}/api/embeddings",
+                json={"model": model, "prompt": text},
+                timeout=30
+            )
+            response.raise_for_status()
+            embeddings.append(response.json()["embedding"])
+        logger.info(f"Successfully generated {len(embeddings)} embeddings.")
+        return embeddings
     except requests.exceptions.RequestException as e:
         logger.error(f"Ollama request error: {e}")
         raise
@@ -28,16 +59,18 @@ def get_ollama_embedding(text: str, ollama_host: str, ollama_port: str, model: s
         logger.error(f"An unexpected error occurred during embedding generation: {e}")
         raise
 
+def get_ollama_embedding(text: str, ollama_host: str, ollama_port: str, model: str = 'nomic-embed-text') -> list[float]:
+    """
+    Generates an embedding for the given text using the Ollama service.
+    """
+    return get_ollama_embeddings([text], ollama_host, ollama_port, model)[0]
+
 def save_embedding_to_chroma(collection_name: str, embedding: list[float], document: str, doc_id: str, metadata: dict):
     """
     Saves a document and its embedding to a specified ChromaDB collection.
     """
     try:
-        chroma_host = os.getenv('CHROMA_HOST', 'localhost')
-        chroma_port = int(os.getenv('CHROMA_PORT', '8000'))
-
-        logger.info(f"Connecting to ChromaDB at {chroma_host}:{chroma_port}...")
-        chroma_client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
+        chroma_client = get_chroma_client()
 
         logger.info(f"Getting or creating collection: {collection_name}")
         collection = chroma_client.get_or_create_collection(name=collection_name)
@@ -92,8 +125,7 @@ if __name__ == "__main__":
             
             # Optional: Verify the data was saved
             logger.info("Verifying data in ChromaDB...")
-            chroma_client = chromadb.HttpClient(host=os.getenv('CHROMA_HOST', 'localhost'), port=int(os.getenv('CHROMA_PORT', '8000')))
-            collection = chroma_client.get_collection(name=NEW_COLLECTION_NAME)
+            collection = get_chroma_client().get_collection(name=NEW_COLLECTION_NAME)
             retrieved_doc = collection.get(ids=[DOCUMENT_ID])
             logger.info(f"Retrieved document from ChromaDB: {retrieved_doc}")
 
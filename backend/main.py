@@ -1,19 +1,30 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import mysql.connector
 from mysql.connector import Error
-import chromadb
+from mysql.connector.errors import PoolError, IntegrityError, DataError
+from mysql.connector.pooling import MySQLConnectionPool
 from chromadb.config import Settings
 import requests
+import httpx
+import asyncio
+import functools
+import threading
 import json
 import os
+import numpy as np
 from datetime import datetime
 import logging
 from contextlib import asynccontextmanager
-from embedding_generator import embed_and_store_schema, get_ollama_embedding
-from sql_generator import generate_sql_with_ollama
+from embedding_generator import embed_and_store_schema, fetch_schema_tables, get_schema_fingerprint, get_ollama_embedding_async, get_ollama_embeddings_async
+from sql_generator import generate_sql_with_ollama_async
+from query_cache import LRUCache, normalize_query, find_semantic_match, FEEDBACK_WHERE
+from chroma_batcher import ChromaBatcher
+from vector_cache import FeedbackVectorCache
+from chroma_client import get_chroma_client, get_schema_collection
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,7 +32,15 @@ logger = logging.getLogger(__name__)
 
 # Global variables for models and clients
 embedding_model = None
-chroma_client = None
+feedback_batcher = None
+
+# Exact-match cache of generated SQL keyed by (normalized question, schema hash)
+sql_cache = LRUCache(maxsize=int(os.getenv('SQL_CACHE_SIZE', '1024')))
+SEMANTIC_CACHE_MAX_DISTANCE = float(os.getenv('SEMANTIC_CACHE_MAX_DISTANCE', '0.1'))
+# Stored feedback embeddings keyed by query_id, so /similar-queries skips the ChromaDB fetch
+embedding_cache = LRUCache(maxsize=int(os.getenv('EMBEDDING_CACHE_SIZE', '10000')))
+# In-memory cosine search over feedback embeddings; set FEEDBACK_VECTOR_CACHE=0 to query ChromaDB instead
+feedback_vectors = FeedbackVectorCache(get_schema_collection) if os.getenv('FEEDBACK_VECTOR_CACHE', '1') == '1' else None
 
 # Debugpy remote debugging
 # if os.getenv("DEBUGPY", "0") == "1":
@@ -33,37 +52,69 @@ chroma_client = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global embedding_model, chroma_client
+    global embedding_model, feedback_batcher
     
     # Initialize embedding model
     # logger.info("Loading embedding model...")
     # embedding_model_name = os.getenv('EMBEDDING_MODEL', 'nomic-embed-text')
     # embedding_model = SentenceTransformer(embedding_model_name)
     
-    # Initialize ChromaDB client
-    logger.info("Connecting to ChromaDB...")
-    chroma_client = chromadb.HttpClient(
-        host=os.getenv('CHROMA_HOST', 'localhost'),
-        port=int(os.getenv('CHROMA_PORT', '8000'))
+    # Shared async HTTP client for Ollama calls made from request handlers
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=90,
+        limits=httpx.Limits(max_keepalive_connections=40, max_connections=100)
     )
-    
+
+    # Schema context for prompts is cached in memory and refreshed on change
+    app.state.schema_context = ""
+    app.state.schema_hash = None
+    app.state.schema_tables = None
+
+    # Feedback rows are written to MySQL behind the request by a draining worker
+    app.state.feedback_queue = asyncio.Queue()
+    feedback_writer = asyncio.create_task(drain_feedback_queue(app.state.feedback_queue))
+
+    # Feedback vectors are written to ChromaDB in batches; the collection is looked up per write
+    feedback_batcher = ChromaBatcher(
+        get_schema_collection,
+        batch_size=int(os.getenv('CHROMA_BATCH_SIZE', '100')),
+        flush_interval=float(os.getenv('CHROMA_FLUSH_INTERVAL', '2')),
+        logger=logger
+    )
+
     # Create collection if it doesn't exist
     try:
-        collection = chroma_client.get_or_create_collection(
-            name="db_schema",
-            metadata={"description": "SQL query examples for training"}
-        )
+        logger.info("Connecting to ChromaDB...")
+        await run_blocking(get_schema_collection)
         logger.info("ChromaDB collection ready")
-        # Embed and store schema at startup
-        embed_and_store_schema(chroma_client, get_mysql_connection, logger)
-        logger.info(f"ChromaDB collection after embed: {collection.get(ids=['mysql_schema'])}")
     except Exception as e:
         logger.error(f"ChromaDB initialization error: {e}")
+
+    # Embed and store schema at startup; the schema context is cached even while ChromaDB is down
+    try:
+        await refresh_schema_cache(app)
+    except Exception as e:
+        logger.error(f"Schema cache initialization error: {e}")
+
+    schema_watch_interval = int(os.getenv('SCHEMA_WATCH_INTERVAL', '60'))
+    schema_watcher = None
+    if schema_watch_interval > 0:
+        schema_watcher = asyncio.create_task(watch_schema_changes(app, schema_watch_interval))
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
+    if schema_watcher:
+        schema_watcher.cancel()
+    feedback_writer.cancel()
+    try:
+        await flush_feedback_queue(app.state.feedback_queue)
+    except Exception as e:
+        logger.error(f"Dropping {app.state.feedback_queue.qsize()} unwritten feedback rows on shutdown: {e}")
+    await run_blocking(feedback_batcher.flush)
+    await app.state.http.aclose()
 
 app = FastAPI(title="Text2SQL API", lifespan=lifespan)
 
@@ -76,10 +127,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies such as /schema and /execute-sql results
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Pydantic models
 class TextToSQLRequest(BaseModel):
     text: str
     context: Optional[str] = None
+    regenerate: bool = False  # skip every cache and ask the LLM again
 
 class QueryFeedback(BaseModel):
     query_id: str
@@ -96,22 +151,84 @@ class DatabaseSchema(BaseModel):
     tables: List[Dict[str, Any]]
 
 # Database connection
+_mysql_pool = None
+_mysql_pool_lock = threading.Lock()
+
+def mysql_config():
+    return {
+        "host": os.getenv('MYSQL_HOST', 'mysql'),
+        "port": int(os.getenv('MYSQL_PORT', '3306')),
+        "user": os.getenv('MYSQL_USER', 'app_user'),
+        "password": os.getenv('MYSQL_PASSWORD', 'app_password'),
+        "database": os.getenv('MYSQL_DATABASE', 'text2sql_db')
+    }
+
+def get_mysql_pool():
+    """Create the shared connection pool on first use, once MySQL is reachable"""
+    global _mysql_pool
+    if _mysql_pool is None:
+        with _mysql_pool_lock:
+            if _mysql_pool is None:
+                _mysql_pool = MySQLConnectionPool(
+                    pool_name="t2s",
+                    pool_size=int(os.getenv('MYSQL_POOL_SIZE', '10')),
+                    **mysql_config()
+                )
+    return _mysql_pool
+
 def get_mysql_connection():
+    """Check out a pooled connection; close() returns it to the pool"""
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('MYSQL_HOST', 'mysql'),
-            port=int(os.getenv('MYSQL_PORT', '3306')),
-            user=os.getenv('MYSQL_USER', 'app_user'),
-            password=os.getenv('MYSQL_PASSWORD', 'app_password'),
-            database=os.getenv('MYSQL_DATABASE', 'text2sql_db')
-        )
-        return connection
+        try:
+            return get_mysql_pool().get_connection()
+        except PoolError:
+            # Pool exhausted: serve the request with a dedicated connection rather than failing it
+            logger.warning("MySQL connection pool exhausted, opening a dedicated connection")
+            return mysql.connector.connect(**mysql_config())
     except Error as e:
         logger.error(f"Database connection error: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
-# Ollama LLM integration
-generate_sql_with_llama = generate_sql_with_ollama
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking MySQL/ChromaDB call in the default executor so it does not stall the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+def read_schema_tables():
+    connection = get_mysql_connection()
+    try:
+        return fetch_schema_tables(connection)
+    finally:
+        connection.close()
+
+def schema_response(tables):
+    return {
+        "tables": [
+            {"table_name": table_name, "columns": columns}
+            for table_name, columns in tables.items()
+        ]
+    }
+
+async def refresh_schema_cache(app: FastAPI, tables=None):
+    """Re-embed the MySQL schema and swap the cached schema context, hash and /schema response"""
+    # All three are derived from a single schema read so they can never disagree
+    if tables is None:
+        tables = await run_blocking(read_schema_tables)
+    schema_context = await run_blocking(embed_and_store_schema, get_chroma_client, tables, logger)
+    app.state.schema_context = schema_context
+    app.state.schema_hash = get_schema_fingerprint(tables)
+    app.state.schema_tables = schema_response(tables)
+
+async def watch_schema_changes(app: FastAPI, interval: int):
+    """Background task: refresh the schema cache when the schema fingerprint changes"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            tables = await run_blocking(read_schema_tables)
+            if get_schema_fingerprint(tables) != app.state.schema_hash:
+                logger.info("MySQL schema changed, refreshing cached schema context")
+                await refresh_schema_cache(app, tables)
+        except Exception as e:
+            logger.error(f"Schema watch error: {e}")
 
 # API endpoints
 @app.get("/")
@@ -131,74 +248,105 @@ async def health_check():
     }
 
 @app.get("/schema")
-async def get_database_schema():
-    """Get database schema information"""
-    connection = None
+async def get_database_schema(refresh: bool = False):
+    """Get database schema information, served from memory unless refresh=true"""
+    if refresh or app.state.schema_tables is None:
+        try:
+            # Refresh the prompt context and hash together with this response, from one schema read
+            await refresh_schema_cache(app)
+        except Error as e:
+            logger.error(f"Schema retrieval error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to retrieve schema")
+    return app.state.schema_tables
+
+@app.post("/refresh-schema")
+async def refresh_schema():
+    """Re-read the database schema and refresh the cached schema context"""
     try:
-        connection = get_mysql_connection()
-        cursor = connection.cursor(dictionary=True)
-        # Get all tables
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
-        schema_info = []
-        for table in tables:
-            table_name = list(table.values())[0]
-            # Get table structure
-            cursor.execute(f"DESCRIBE {table_name}")
-            columns = cursor.fetchall()
-            schema_info.append({
-                "table_name": table_name,
-                "columns": columns
-            })
-        return {"tables": schema_info}
-    except Error as e:
-        logger.error(f"Schema retrieval error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to retrieve schema")
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
+        await refresh_schema_cache(app)
+        return {"message": "Schema refreshed successfully", "schema_hash": app.state.schema_hash}
+    except Exception as e:
+        logger.error(f"Schema refresh error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to refresh schema")
 
-@app.post("/generate-sql")
-async def generate_sql(request: TextToSQLRequest):
-    """Generate SQL query from natural language"""
+def find_approved_query(text: str):
+    """Return the latest thumbs-up feedback row for the exact same question, if any"""
+    connection = get_mysql_connection()
     try:
-        # Check if the request.text already exists in the feedback table
-        connection = get_mysql_connection()
         cursor = connection.cursor(dictionary=True)
         cursor.execute(
            "SELECT generated_sql, query_id FROM query_feedback WHERE natural_language = %s AND feedback = %s ORDER BY created_at DESC LIMIT 1",
-             (request.text, "thumbs_up")
+             (text, "thumbs_up")
         )
-        row = cursor.fetchone()
+        return cursor.fetchone()
+    finally:
         connection.close()
-        if row:
-            return {
-                "query_id": row["query_id"],
-                "natural_language": request.text,
-                "generated_sql": row["generated_sql"],
-                "schema_context": ""
-            }
-        
-        # In case if not exist in feed back table then Get database schema for context
-        # schema_response = await get_database_schema()
-        schema_context = ""
-        collection = chroma_client.get_collection("db_schema")
-        docs = collection.get(ids=['mysql_schema'])
-        if  docs['documents']:
-            schema_context = docs['documents'][0]
-        else:
-            logger.info("No schema embedding found in ChromaDB")
 
-        # Embed and store schema at startup        
-        # for table in schema_response["tables"]:
-        #     schema_context += f"\nTable: {table['table_name']}\n"
-        #     for column in table["columns"]:
-        #         schema_context += f"  - {column['Field']} ({column['Type']})\n"
-        
-        # Generate SQL using Llama
-        generated_sql = generate_sql_with_llama(request.text, schema_context)
+def new_query_id() -> str:
+    return f"query_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+async def find_cached_sql(request: TextToSQLRequest, cache_key, schema_context: str):
+    """Return a /generate-sql response from the caches, or None when the LLM has to run"""
+    # 1. Exact-match cache of previously generated SQL
+    cached_sql = sql_cache.get(cache_key)
+    if cached_sql is not None:
+        return {
+            "query_id": new_query_id(),
+            "natural_language": request.text,
+            "generated_sql": cached_sql,
+            "schema_context": schema_context
+        }
+
+    # Check if the request.text already exists in the feedback table
+    row = await run_blocking(find_approved_query, request.text)
+    if row:
+        return {
+            "query_id": row["query_id"],
+            "natural_language": request.text,
+            "generated_sql": row["generated_sql"],
+            "schema_context": ""
+        }
+
+    # 2. Semantic cache over the feedback entries stored in ChromaDB
+    try:
+        embedding = await get_ollama_embedding_async(app.state.http, request.text, logger=logger)
+        matched_sql = await run_blocking(find_semantic_match, get_schema_collection, embedding, SEMANTIC_CACHE_MAX_DISTANCE)
+    except Exception as e:
+        logger.error(f"Semantic cache lookup error: {e}")
+        matched_sql = None
+    if matched_sql:
+        sql_cache.put(cache_key, matched_sql)
+        return {
+            "query_id": new_query_id(),
+            "natural_language": request.text,
+            "generated_sql": matched_sql,
+            "schema_context": schema_context
+        }
+    return None
+
+@app.post("/generate-sql")
+async def generate_sql(request: TextToSQLRequest):
+    """Generate SQL query from natural language"""
+    try:
+        # Schema context is cached in memory at startup, no DB round-trip needed
+        schema_context = app.state.schema_context
+        if not schema_context:
+            logger.info("No cached schema context available")
+
+        cache_key = (normalize_query(request.text), app.state.schema_hash)
+        if not request.regenerate:
+            cached_response = await find_cached_sql(request, cache_key, schema_context)
+            if cached_response:
+                return cached_response
+
+        # 3. Generate SQL using Llama
+        generated_sql = await generate_sql_with_ollama_async(app.state.http, request.text, schema_context)
+        # A regenerated answer is unreviewed, so it must not displace cached or approved SQL for other users;
+        # it only enters the cache once a thumbs-up reaches update_sql_cache
+        if not request.regenerate:
+            sql_cache.put(cache_key, generated_sql)
         # Create query ID for tracking
-        query_id = f"query_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        query_id = new_query_id()
         
         return {
             "query_id": query_id,
@@ -211,7 +359,7 @@ async def generate_sql(request: TextToSQLRequest):
         raise HTTPException(status_code=500, detail="Failed to generate SQL")
 
 @app.post("/execute-sql")
-async def execute_sql(request: SQLExecutionRequest):
+def execute_sql(request: SQLExecutionRequest):
     """Execute SQL query and return results"""
     connection = None
     try:
@@ -238,61 +386,171 @@ async def execute_sql(request: SQLExecutionRequest):
         logger.error(f"SQL execution error: {e}")
         raise HTTPException(status_code=400, detail=f"SQL execution failed: {str(e)}")
     finally:
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
-@app.post("/feedback")
-async def submit_feedback(feedback: QueryFeedback):
-    """Submit feedback for generated SQL query"""
+FEEDBACK_INSERT_QUERY = """
+INSERT INTO query_feedback 
+(query_id, natural_language, generated_sql, feedback, corrected_sql, comments, created_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def insert_feedback_rows(rows):
+    """
+    Store feedback in MySQL for structured querying, as one multi-row INSERT.
+    Only rows MySQL rejects individually are dropped; connection failures are raised to the caller.
+    """
+    connection = get_mysql_connection()
     try:
-        # Store feedback in ChromaDB for training
-        collection = chroma_client.get_collection("db_schema")
-        # Create embedding for the natural language query using Ollama
-        embedding = get_ollama_embedding(feedback.natural_language, logger=logger)
-        # Prepare metadata
-        metadata = {
-            "query_id": feedback.query_id,
-            "feedback": feedback.feedback,
-            "generated_sql": feedback.generated_sql,
-            "timestamp": datetime.now().isoformat()
-        }
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(FEEDBACK_INSERT_QUERY, rows)
+            connection.commit()
+        except (IntegrityError, DataError) as e:
+            # One bad row (e.g. a duplicate query_id) must not drop the whole batch
+            connection.rollback()
+            logger.error(f"Batched feedback insert failed, retrying row by row: {e}")
+            for row in rows:
+                try:
+                    cursor.execute(FEEDBACK_INSERT_QUERY, row)
+                    connection.commit()
+                except (IntegrityError, DataError) as row_error:
+                    connection.rollback()
+                    logger.error(f"Feedback insert error for {row[0]}: {row_error}")
+    finally:
+        connection.close()
+
+def feedback_row(feedback: QueryFeedback):
+    return (
+        feedback.query_id,
+        feedback.natural_language,
+        feedback.generated_sql,
+        feedback.feedback,
+        feedback.corrected_sql,
+        feedback.comments,
+        datetime.now()
+    )
+
+def feedback_metadata(feedback: QueryFeedback):
+    metadata = {
+        "query_id": feedback.query_id,
+        "feedback": feedback.feedback,
+        "generated_sql": feedback.generated_sql,
+        "timestamp": datetime.now().isoformat()
+    }
+    if feedback.corrected_sql:
+        metadata["corrected_sql"] = feedback.corrected_sql
+    if feedback.comments:
+        metadata["comments"] = feedback.comments
+    return metadata
+
+def update_sql_cache(feedback: QueryFeedback):
+    """Serve approved SQL from the exact-match cache, and never SQL that a user rejected"""
+    cache_key = (normalize_query(feedback.natural_language), app.state.schema_hash)
+    if feedback.feedback == "thumbs_up":
+        sql_cache.put(cache_key, feedback.generated_sql)
+    elif feedback.feedback == "thumbs_down":
         if feedback.corrected_sql:
-            metadata["corrected_sql"] = feedback.corrected_sql
-        if feedback.comments:
-            metadata["comments"] = feedback.comments
-        # Store in ChromaDB
-        collection.add(
+            sql_cache.put(cache_key, feedback.corrected_sql)
+        else:
+            sql_cache.pop(cache_key)
+
+async def enqueue_feedback_row(feedback: QueryFeedback):
+    """Background task: queue the MySQL row for the write-behind worker"""
+    await app.state.feedback_queue.put(feedback_row(feedback))
+
+async def flush_feedback_queue(queue: asyncio.Queue):
+    rows = []
+    while not queue.empty():
+        rows.append(queue.get_nowait())
+    if rows:
+        try:
+            await run_blocking(insert_feedback_rows, rows)
+        except Exception:
+            # MySQL is unreachable: keep the already acknowledged rows for the next drain.
+            # Rows that did get written are rejected as duplicate query_ids on the retry.
+            for row in rows:
+                queue.put_nowait(row)
+            raise
+
+async def drain_feedback_queue(queue: asyncio.Queue, interval: float = 0.5):
+    """Background task: every `interval` seconds write all queued feedback rows in one INSERT"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_feedback_queue(queue)
+        except Exception as e:
+            logger.error(f"Feedback write-behind error, {queue.qsize()} rows kept for retry: {e}")
+
+async def index_feedback(feedback: QueryFeedback):
+    """Background task: embed the question and queue it for the batched ChromaDB write"""
+    try:
+        # Create embedding for the natural language query using Ollama
+        embedding = await get_ollama_embedding_async(app.state.http, feedback.natural_language, logger=logger)
+        metadata = feedback_metadata(feedback)
+        embedding_cache.put(feedback.query_id, embedding)
+        if feedback_vectors is not None:
+            await run_blocking(feedback_vectors.add, feedback.query_id, embedding, feedback.natural_language, metadata)
+        # Store in ChromaDB for training
+        await run_blocking(
+            feedback_batcher.add,
+            ids=[feedback.query_id],
             embeddings=[embedding],
             documents=[feedback.natural_language],
-            metadatas=[metadata],
-            ids=[feedback.query_id]
+            metadatas=[metadata]
         )
-        # Also store in MySQL for structured querying
-        connection = get_mysql_connection()
-        cursor = connection.cursor()
-        insert_query = """
-        INSERT INTO query_feedback 
-        (query_id, natural_language, generated_sql, feedback, corrected_sql, comments, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (
-            feedback.query_id,
-            feedback.natural_language,
-            feedback.generated_sql,
-            feedback.feedback,
-            feedback.corrected_sql,
-            feedback.comments,
-            datetime.now()
-        ))
-        connection.commit()
-        connection.close()
+    except Exception as e:
+        logger.error(f"Feedback indexing error: {e}")
+
+@app.post("/feedback", status_code=202)
+async def submit_feedback(feedback: QueryFeedback, background_tasks: BackgroundTasks):
+    """Submit feedback for generated SQL query"""
+    try:
+        # MySQL insert, embedding and the ChromaDB write all happen after the response is sent
+        background_tasks.add_task(enqueue_feedback_row, feedback)
+        background_tasks.add_task(index_feedback, feedback)
+        update_sql_cache(feedback)
         return {"message": "Feedback submitted successfully", "query_id": feedback.query_id}
     except Exception as e:
         logger.error(f"Feedback submission error: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit feedback")
 
+def store_feedback_batch(feedbacks: List[QueryFeedback], embeddings):
+    """Write a batch of feedback with one MySQL executemany and one ChromaDB upsert"""
+    insert_feedback_rows([feedback_row(feedback) for feedback in feedbacks])
+    ids, documents, metadatas = [], [], []
+    for feedback in feedbacks:
+        ids.append(feedback.query_id)
+        documents.append(feedback.natural_language)
+        metadatas.append(feedback_metadata(feedback))
+    get_schema_collection().upsert(ids=ids, embeddings=list(embeddings), documents=documents, metadatas=metadatas)
+    for query_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+        embedding_cache.put(query_id, embedding)
+        if feedback_vectors is not None:
+            feedback_vectors.add(query_id, embedding, document, metadata)
+
+@app.post("/feedback/batch")
+async def submit_feedback_batch(feedbacks: List[QueryFeedback]):
+    """Submit feedback for many generated SQL queries at once, e.g. to replay a feedback backlog"""
+    if not feedbacks:
+        return {"message": "No feedback submitted", "count": 0}
+    # A replayed backlog may repeat a query_id; keep its last entry so MySQL and ChromaDB get the same rows
+    feedbacks = list({feedback.query_id: feedback for feedback in feedbacks}.values())
+    try:
+        # One Ollama round-trip embeds every question in the batch
+        embeddings = await get_ollama_embeddings_async(
+            app.state.http, [feedback.natural_language for feedback in feedbacks], logger=logger
+        )
+        await run_blocking(store_feedback_batch, feedbacks, embeddings)
+        for feedback in feedbacks:
+            update_sql_cache(feedback)
+        return {"message": "Feedback submitted successfully", "count": len(feedbacks)}
+    except Exception as e:
+        logger.error(f"Batch feedback submission error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to submit feedback")
+
 @app.get("/feedback-stats")
-async def get_feedback_stats():
+def get_feedback_stats():
     """Get feedback statistics"""
     connection = None
     try:
@@ -330,41 +588,63 @@ async def get_feedback_stats():
         logger.error(f"Stats retrieval error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve statistics")
     finally:
-        if connection and connection.is_connected():
+        if connection:
             connection.close()
 
+def cosine_similarities(embeddings, embedding):
+    matrix = np.asarray(embeddings, dtype=np.float32).reshape(-1, len(embedding))
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+    return np.divide(matrix @ np.asarray(embedding, dtype=np.float32), norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms > 0)
+
+def find_similar_queries(query_id: str, limit: int):
+    if feedback_vectors is not None:
+        similar_queries = feedback_vectors.search(query_id, limit)
+        if similar_queries is not None:
+            return similar_queries
+
+    collection = get_schema_collection()
+    
+    # Reuse the stored embedding of the original query instead of embedding its text again
+    embedding = embedding_cache.get(query_id)
+    if embedding is None:
+        results = collection.get(ids=[query_id], include=["embeddings"])
+        if not results['ids']:
+            raise HTTPException(status_code=404, detail="Query not found")
+        embedding = np.asarray(results['embeddings'][0], dtype=np.float32)
+        embedding_cache.put(query_id, embedding)
+    
+    # Find similar queries
+    similar_results = collection.query(
+        query_embeddings=[embedding],
+        n_results=limit + 1,  # +1 to exclude the original
+        where=FEEDBACK_WHERE,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    
+    # Score by cosine similarity, the same measure the in-memory vector cache reports
+    scores = cosine_similarities(similar_results['embeddings'][0], embedding)
+    
+    # Filter out the original query and format response
+    similar_queries = []
+    for i, (doc, metadata) in enumerate(zip(similar_results['documents'][0], similar_results['metadatas'][0])):
+        if metadata.get('query_id') != query_id:
+            similar_queries.append({
+                "natural_language": doc,
+                "generated_sql": metadata.get('generated_sql', ''),
+                "feedback": metadata.get('feedback', ''),
+                "similarity_score": float(scores[i])
+            })
+    return similar_queries[:limit]
+
 @app.get("/similar-queries/{query_id}")
 async def get_similar_queries(query_id: str, limit: int = 5):
     """Get similar queries from ChromaDB"""
     try:
-        collection = chroma_client.get_collection("db_schema")
-        
-        # Get the original query
-        results = collection.get(ids=[query_id])
-        if not results['documents']:
-            raise HTTPException(status_code=404, detail="Query not found")
-        
-        original_query = results['documents'][0]
-        
-        # Find similar queries
-        similar_results = collection.query(
-            query_texts=[original_query],
-            n_results=limit + 1  # +1 to exclude the original
-        )
-        
-        # Filter out the original query and format response
-        similar_queries = []
-        for i, (doc, metadata) in enumerate(zip(similar_results['documents'][0], similar_results['metadatas'][0])):
-            if metadata['query_id'] != query_id:
-                similar_queries.append({
-                    "natural_language": doc,
-                    "generated_sql": metadata.get('generated_sql', ''),
-                    "feedback": metadata.get('feedback', ''),
-                    "similarity_score": 1 - similar_results['distances'][0][i]
-                })
-        
-        return {"similar_queries": similar_queries[:limit]}
+        similar_queries = await run_blocking(find_similar_queries, query_id, limit)
+        return {"similar_queries": similar_queries}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Similar queries error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve similar queries")
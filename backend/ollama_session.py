@@ -0,0 +1,10 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared HTTP session so Ollama calls reuse pooled keep-alive connections
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0))
+session.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"})
+
+# Request bodies are pre-encoded with orjson, so the content type is set explicitly
+JSON_HEADERS = {"Content-Type": "application/json"}
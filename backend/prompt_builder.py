@@ -1,10 +1,20 @@
+from functools import lru_cache
+
+# Static parts of the prompt are built once at import time
+_PREFIX = "You are an expert SQL query generator. Given a natural language question and database schema, generate a precise SQL query.\n\n"
+_SCHEMA_FMT = "Database Schema:\n{schema}\n\n"
+_QUESTION_FMT = "Natural Language Question: {prompt}\n\n"
+_SUFFIX = (
+    "Generate ONLY the SQL query without any explanation or formatting. The query should be executable and follow MySQL syntax.\n\n"
+    "SQL Query:"
+)
+
+@lru_cache(maxsize=4)
+def _schema_block(schema_context: str) -> str:
+    # Keyed by the schema string itself: its hash is cached on the str object, so a hit is cheap
+    return _PREFIX + _SCHEMA_FMT.format(schema=schema_context)
+
 class SQLPromptBuilder:
     @staticmethod
     def build_sql_prompt(prompt: str, schema_context: str = "") -> str:
-        return (
-            "You are an expert SQL query generator. Given a natural language question and database schema, generate a precise SQL query.\n\n"
-            f"Database Schema:\n{schema_context}\n\n"
-            f"Natural Language Question: {prompt}\n\n"
-            "Generate ONLY the SQL query without any explanation or formatting. The query should be executable and follow MySQL syntax.\n\n"
-            "SQL Query:"
-        )
+        return "".join((_schema_block(schema_context), _QUESTION_FMT.format(prompt=prompt), _SUFFIX))
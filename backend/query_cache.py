@@ -0,0 +1,67 @@
+import re
+import threading
+from collections import OrderedDict
+
+# ChromaDB filter selecting feedback entries (schema documents carry no feedback field)
+FEEDBACK_WHERE = {"feedback": {"$in": ["thumbs_up", "thumbs_down"]}}
+
+## Function to normalize a natural language question into a cache key
+def normalize_query(text: str) -> str:
+    """
+    Lower-cases the text and collapses whitespace so trivially different prompts share a cache entry.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+class LRUCache:
+    """
+    Small thread-safe least-recently-used mapping for in-process caches.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+## Function to find a previously reviewed query that is semantically equivalent
+def find_semantic_match(get_collection, embedding, max_distance: float):
+    """
+    Returns the SQL of the closest feedback entry in ChromaDB when its distance is below max_distance.
+    Thumbs-down entries are only reused through their corrected SQL.
+    The collection is resolved here, inside the worker thread, since the lookup may block on ChromaDB.
+    """
+    results = get_collection().query(
+        query_embeddings=[embedding],
+        n_results=1,
+        where=FEEDBACK_WHERE,
+        include=["metadatas", "distances"]
+    )
+    if not results['ids'] or not results['ids'][0]:
+        return None
+    distance = results['distances'][0][0]
+    metadata = results['metadatas'][0][0]
+    if distance >= max_distance:
+        return None
+    if metadata.get('feedback') == 'thumbs_up':
+        return metadata.get('generated_sql') or None
+    return metadata.get('corrected_sql') or None
@@ -1,41 +1,83 @@
 import os
-import requests
+import re
+import httpx
+import orjson
 import logging
 from prompt_builder import SQLPromptBuilder
+from ollama_session import JSON_HEADERS
 
-def generate_sql_with_ollama(prompt: str, schema_context: str = "") -> str:
+# A statement terminator at the end of a line means the SQL is complete
+_SQL_TERMINATOR = re.compile(r";[ \t]*\n")
+
+def _build_generate_request(prompt: str, schema_context: str = ""):
     ollama_host = os.getenv('OLLAMA_HOST', 'localhost')
     ollama_port = os.getenv('OLLAMA_PORT', '11434')
     model = os.getenv('OLLAMA_MODEL', 'llama3.2:3b-instruct-q4_0')
     timeout = int(os.getenv('OLLAMA_READ_TIMEOUT', '90'))
     max_tokens = int(os.getenv('OLLAMA_MAX_TOKENS', '500'))
     full_prompt = SQLPromptBuilder.build_sql_prompt(prompt, schema_context)
+    url = f"http://{ollama_host}:{ollama_port}/api/generate"
+    payload = {
+        "model": model,
+        "prompt": full_prompt,
+        "stream": True,
+        "options": {
+            "temperature": 0.1,
+            "top_p": 0.9,
+            "num_predict": max_tokens
+        }
+    }
+    return url, payload, timeout
+
+def _find_sql_end(buffer: str):
+    """Return the index just past the end of the SQL statement, or None while it may still continue"""
+    ends = []
+    text_start = len(buffer) - len(buffer.lstrip())
+    if buffer.startswith('```', text_start):
+        closing_fence = buffer.find('```', text_start + 3)
+        if closing_fence != -1:
+            ends.append(closing_fence + 3)
+    terminator = _SQL_TERMINATOR.search(buffer)
+    if terminator:
+        ends.append(terminator.start() + 1)
+    return min(ends) if ends else None
+
+def _consume_chunk(buffer: str, line) -> tuple:
+    """Append one streamed JSON line to the buffer and report whether generation can stop"""
+    chunk = orjson.loads(line)
+    buffer += chunk.get('response', '')
+    end = _find_sql_end(buffer)
+    if end is not None:
+        return buffer[:end], True
+    return buffer, chunk.get('done', False)
+
+def _clean_sql(response_text: str) -> str:
+    sql_query = response_text.strip()
+    if sql_query.startswith('```sql'):
+        sql_query = sql_query[6:]
+    if sql_query.endswith('```'):
+        sql_query = sql_query[:-3]
+    return sql_query.strip()
+
+async def generate_sql_with_ollama_async(http_client: httpx.AsyncClient, prompt: str, schema_context: str = "") -> str:
+    url, payload, timeout = _build_generate_request(prompt, schema_context)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Sending generate request to %s (prompt len=%d)", url, len(payload["prompt"]))
     try:
-        response = requests.post(
-            f"http://{ollama_host}:{ollama_port}/api/generate",
-            json={
-                "model": model,
-                "prompt": full_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "top_p": 0.9,
-                    "max_tokens": max_tokens
-                }
-            },
-            timeout=timeout
-        )
-        if response.status_code == 200:
-            result = response.json()
-            sql_query = result.get('response', '').strip()
-            if sql_query.startswith('```sql'):
-                sql_query = sql_query[6:]
-            if sql_query.endswith('```'):
-                sql_query = sql_query[:-3]
-            return sql_query.strip()
-        else:
-            logging.error(f"Ollama API error: {response.status_code}")
-            raise Exception("LLM generation failed")
-    except requests.exceptions.RequestException as e:
+        # Leaving the block closes the stream, which stops Ollama as soon as the SQL is complete
+        async with http_client.stream("POST", url, content=orjson.dumps(payload), headers=JSON_HEADERS, timeout=timeout) as response:
+            if response.status_code == 200:
+                buffer = ""
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    buffer, done = _consume_chunk(buffer, line)
+                    if done:
+                        break
+                return _clean_sql(buffer)
+            else:
+                logging.error(f"Ollama API error: {response.status_code}")
+                raise Exception("LLM generation failed")
+    except httpx.HTTPError as e:
         logging.error(f"Ollama request error: {e}")
-        raise Exception("LLM service unavailable")
\ No newline at end of file
+        raise Exception("LLM service unavailable")
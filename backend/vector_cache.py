@@ -0,0 +1,93 @@
+import threading
+import numpy as np
+from query_cache import FEEDBACK_WHERE
+
+class FeedbackVectorCache:
+    """
+    Keeps every feedback embedding L2-normalized in one float32 matrix so similarity search is a
+    single matrix-vector product instead of a ChromaDB round-trip.
+    Warmed lazily from ChromaDB on first search; new feedback is appended in place.
+    Entries added before warm-up are held back and applied after the ChromaDB load, since they may
+    still be waiting in the write batcher and missing from that load.
+    """
+    def __init__(self, get_collection, initial_capacity: int = 1024):
+        self._get_collection = get_collection
+        self._initial_capacity = initial_capacity
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.matrix = None
+        self._index = {}
+        self._pending = []
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def _ensure_warm(self):
+        if self._warm:
+            return
+        results = self._get_collection().get(where=FEEDBACK_WHERE, include=["embeddings", "documents", "metadatas"])
+        for query_id, embedding, document, metadata in zip(
+            results['ids'], results['embeddings'], results['documents'], results['metadatas']
+        ):
+            self._append(query_id, embedding, document, metadata)
+        for entry in self._pending:
+            self._append(*entry)
+        self._pending = []
+        self._warm = True
+
+    def _append(self, query_id, embedding, document, metadata):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        row = self._index.get(query_id)
+        if row is None:
+            row = len(self.ids)
+            if self.matrix is None:
+                self.matrix = np.zeros((max(self._initial_capacity, 1), vector.shape[0]), dtype=np.float32)
+            elif row == self.matrix.shape[0]:
+                # Grow the preallocated block geometrically so appends stay amortized O(1)
+                self.matrix = np.vstack([self.matrix, np.zeros_like(self.matrix)])
+            self.ids.append(query_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+            self._index[query_id] = row
+        else:
+            self.documents[row] = document
+            self.metadatas[row] = metadata
+        self.matrix[row] = vector
+
+    def add(self, query_id, embedding, document, metadata):
+        with self._lock:
+            if self._warm:
+                self._append(query_id, embedding, document, metadata)
+            else:
+                self._pending.append((query_id, embedding, document, metadata))
+
+    def search(self, query_id: str, limit: int):
+        """
+        Returns up to `limit` feedback entries most similar to query_id by cosine similarity,
+        or None when query_id is not a cached feedback entry.
+        """
+        with self._lock:
+            self._ensure_warm()
+            row = self._index.get(query_id)
+            if row is None:
+                return None
+            size = len(self.ids)
+            k = min(limit, size - 1)
+            if k <= 0:
+                return []
+            scores = self.matrix[:size] @ self.matrix[row]
+            scores[row] = -np.inf
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {
+                    "natural_language": self.documents[i],
+                    "generated_sql": self.metadatas[i].get('generated_sql', ''),
+                    "feedback": self.metadatas[i].get('feedback', ''),
+                    "similarity_score": float(scores[i])
+                }
+                for i in top
+            ]
@@ -1,13 +1,21 @@
 import streamlit as st
-import requests
-import json
+import streamlit.components.v1 as components
+import httpx
+import asyncio
+import orjson
 import pandas as pd
 from datetime import datetime
-import time
 import plotly.express as px  # Added for pie chart
 
 # Configuration
 FASTAPI_URL = "http://fastapi:8000"  # Docker internal network
+REQUEST_TIMEOUT = httpx.Timeout(30, connect=2)
+GENERATE_TIMEOUT = httpx.Timeout(120, connect=2)  # SQL generation waits on the LLM
+JSON_HEADERS = {"Content-Type": "application/json"}
+STATS_COLS = ('feedback', 'count', 'percentage')
+RECENT_COLS = ('query_id', 'natural_language', 'feedback', 'created_at')
+# Only data the always-visible sidebar needs; section data is fetched when its section is active
+SIDEBAR_ENDPOINTS = {"health": "/health", "stats": "/feedback-stats"}
 
 # Page configuration
 st.set_page_config(
@@ -17,70 +25,172 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-<style>
-    .success-box {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        border-radius: 5px;
-        padding: 10px;
-        margin: 10px 0;
-    }
-    .error-box {
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        border-radius: 5px;
-        padding: 10px;
-        margin: 10px 0;
-    }
-    .sql-box {
-        background-color: #f8f9fa;
-        border: 1px solid #e9ecef;
-        border-radius: 5px;
-        padding: 15px;
-        font-family: 'Courier New', monospace;
-        margin: 10px 0;
-    }
-    .feedback-buttons {
-        display: flex;
-        gap: 10px;
-        margin: 10px 0;
-    }
-</style>
-""", unsafe_allow_html=True)
-
 # Helper functions
-def make_api_request(endpoint, method="GET", data=None):
+@st.cache_resource
+def get_http():
+    """Process-wide pooled keep-alive HTTP client shared by every Streamlit user session"""
+    # HTTP/2 multiplexing needs an h2-capable server; plain http:// to uvicorn stays on HTTP/1.1
+    return httpx.Client(
+        base_url=FASTAPI_URL,
+        timeout=REQUEST_TIMEOUT,
+        # A custom transport replaces the client's own pool, so pool and HTTP/2 settings live here
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=2,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=20)
+        ),
+        headers={"Accept-Encoding": "gzip, deflate"}
+    )
+
+def make_api_request(endpoint, method="GET", data=None, timeout=REQUEST_TIMEOUT):
     """Make API request to FastAPI backend"""
     try:
-        url = f"{FASTAPI_URL}{endpoint}"
         if method == "GET":
-            response = requests.get(url)
+            response = get_http().get(endpoint, timeout=timeout)
         elif method == "POST":
-            response = requests.post(url, json=data)
+            response = get_http().post(endpoint, content=orjson.dumps(data), headers=JSON_HEADERS, timeout=timeout)
         
-        if response.status_code == 200:
-            return response.json(), None
+        if 200 <= response.status_code < 300:
+            return orjson.loads(response.content), None
         else:
             return None, f"API Error: {response.status_code} - {response.text}"
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
         return None, f"Connection Error: {str(e)}"
 
+def parse_response(response):
+    """Turn an httpx response (or the exception raised instead) into make_api_request's (data, error) pair"""
+    if isinstance(response, Exception):
+        return None, f"Connection Error: {str(response)}"
+    if 200 <= response.status_code < 300:
+        try:
+            return orjson.loads(response.content), None
+        except orjson.JSONDecodeError as e:
+            return None, f"Connection Error: {str(e)}"
+    return None, f"API Error: {response.status_code} - {response.text}"
+
+async def load_all():
+    """Issue the sidebar GETs concurrently over one keep-alive client"""
+    # Opened per call: every asyncio.run has its own event loop, so the client cannot be cached across runs
+    async with httpx.AsyncClient(
+        base_url=FASTAPI_URL,
+        http2=True,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    ) as client:
+        responses = await asyncio.gather(
+            *(client.get(endpoint) for endpoint in SIDEBAR_ENDPOINTS.values()),
+            return_exceptions=True
+        )
+    return {key: parse_response(response) for key, response in zip(SIDEBAR_ENDPOINTS, responses)}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_sidebar():
+    """Fetch health and stats concurrently, so the sidebar waits for the slower call only"""
+    return asyncio.run(load_all())
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_schema():
+    return make_api_request("/schema")
+
+@st.cache_data(ttl=600, show_spinner=False)
+def build_schema_frames(schema_data):
+    """Build one column DataFrame per table, memoized on the schema payload"""
+    return [(table['table_name'], pd.DataFrame(table['columns'])) for table in schema_data['tables']]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def df_to_csv_bytes(df):
+    """Encode query results as CSV once per result set rather than on every rerun"""
+    return df.to_csv(index=False).encode('utf-8')
+
+@st.cache_resource
+def generation_versions():
+    """Per-question version shared by every session; bumping it retires that question's cached SQL"""
+    return {}
+
+def bump_generation_version(text):
+    versions = generation_versions()
+    versions[text] = versions.get(text, 0) + 1
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def generate_sql(text, version=0, regenerate=False):
+    """
+    Generate SQL once per question and version, repeated prompts skip the LLM.
+    Regenerate and thumbs-down bump the version, evicting that question only.
+    """
+    query_data, query_error = make_api_request(
+        "/generate-sql",
+        "POST",
+        {"text": text, "regenerate": regenerate},
+        timeout=GENERATE_TIMEOUT
+    )
+    if query_error:
+        # Exceptions are not cached, so only this question is retried next time
+        raise RuntimeError(query_error)
+    return query_data
+
+def new_query_id():
+    """Same format as the backend ids; a cached generation still needs a unique feedback key"""
+    return f"query_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+@st.cache_data(ttl=30, show_spinner=False)
+def render_stats(statistics):
+    """Format feedback statistics into (label, value) pairs for st.metric"""
+    return [
+        (
+            f"{'👍' if stat['feedback'] == 'thumbs_up' else '👎'} {stat['feedback'].replace('_', ' ').title()}",
+            f"{stat['count']} ({stat['percentage']:.1f}%)"
+        )
+        for stat in statistics
+    ]
+
+@st.cache_data(ttl=30, show_spinner=False)
+def build_stats_frames(stats_data):
+    """Build the analytics DataFrames with known columns, skipping per-row key inference"""
+    feedback_df = pd.DataFrame.from_records(stats_data.get('statistics') or [], columns=STATS_COLS)
+    recent_df = pd.DataFrame.from_records(stats_data.get('recent_feedback') or [], columns=RECENT_COLS)
+    return feedback_df, recent_df
+
+def cached_request(fetch):
+    """Call a cached fetch helper, dropping the cache entry when it holds an error"""
+    data, error = fetch()
+    if error:
+        fetch.clear()
+    return data, error
+
 def display_sql_query(sql_query, query_id=None):
-    """Display SQL query in a formatted box"""
-    st.markdown(f"""
-    <div class="sql-box">
-        <strong>Generated SQL Query:</strong><br>
-        <code>{sql_query}</code>
-    </div>
-    """, unsafe_allow_html=True)
+    """Display SQL query with syntax highlighting"""
+    st.code(sql_query, language='sql')
+
+def copy_button(text, label="📋 Copy Query"):
+    """Copy text to the clipboard in the browser, without a rerun"""
+    # A JSON string is a valid JS string literal; "</" is escaped so the SQL cannot close the script tag
+    text_literal = orjson.dumps(text).decode().replace("</", "<\\/")
+    components.html(f"""
+    <button id="copy" style="padding: 0.4rem 0.8rem; border: 1px solid #ccc; border-radius: 0.5rem; background: white; cursor: pointer;">{label}</button>
+    <script>
+    const text = {text_literal};
+    const button = document.getElementById("copy");
+    const failed = () => {{ button.innerText = "❌ Copy failed, copy from the SQL box above"; }};
+    button.addEventListener("click", () => {{
+        // navigator.clipboard only exists in secure contexts (https or localhost)
+        if (!navigator.clipboard) {{
+            failed();
+            return;
+        }}
+        navigator.clipboard.writeText(text).then(() => {{ button.innerText = "✅ Copied!"; }}, failed);
+    }});
+    </script>
+    """, height=50)
 
 # Initialize session state
 if 'current_query' not in st.session_state:
     st.session_state.current_query = None
 if 'query_results' not in st.session_state:
     st.session_state.query_results = None
+if 'query_results_df' not in st.session_state:
+    st.session_state.query_results_df = None
+if 'result_filename' not in st.session_state:
+    st.session_state.result_filename = None
 if 'feedback_submitted' not in st.session_state:
     st.session_state.feedback_submitted = False
 
@@ -92,8 +202,12 @@ st.markdown("Convert natural language to SQL queries with AI assistance")
 with st.sidebar:
     st.header("🛠️ System Status")
     
+    sidebar_data = fetch_sidebar()
+    if sidebar_data["health"][1] or sidebar_data["stats"][1]:
+        fetch_sidebar.clear()
+
     # Health check
-    health_data, health_error = make_api_request("/health")
+    health_data, health_error = sidebar_data["health"]
     if health_data:
         st.success("✅ System Online")
         st.json(health_data)
@@ -102,57 +216,60 @@ with st.sidebar:
         st.error(health_error)
     
     st.header("📊 Statistics")
-    stats_data, stats_error = make_api_request("/feedback-stats")
+    stats_data, stats_error = sidebar_data["stats"]
     if stats_data:
         if stats_data.get('statistics'):
-            for stat in stats_data['statistics']:
-                emoji = "👍" if stat['feedback'] == 'thumbs_up' else "👎"
-                st.metric(
-                    f"{emoji} {stat['feedback'].replace('_', ' ').title()}", 
-                    f"{stat['count']} ({stat['percentage']:.1f}%)"
-                )
+            for label, value in render_stats(stats_data['statistics']):
+                st.metric(label, value)
 
 # Main content area
-tab1, tab2, tab3, tab4 = st.tabs(["🏠 Query Generator", "🗃️ Database Schema", "📈 Analytics", "⚙️ Settings"])
+# Only the selected section runs, so hidden sections issue no backend calls
+SECTIONS = ["🏠 Query Generator", "🗃️ Database Schema", "📈 Analytics", "⚙️ Settings"]
+active_tab = st.radio("Section", SECTIONS, horizontal=True, key='active_tab', label_visibility="collapsed")
 
-with tab1:
+if active_tab == SECTIONS[0]:
     st.header("Generate SQL from Natural Language")
     
-    # Input section
-    col1, col2 = st.columns([3, 1])
+    # Widgets inside the form only rerun the script on submit, not on every edit
+    with st.form("query_form", clear_on_submit=False):
+        # Input section
+        col1, col2 = st.columns([3, 1])
     
-    with col1:
-        user_query = st.text_area(
-            "Enter your question in natural language:",
-            placeholder="e.g., Show me all customers who made orders in the last 30 days",
-            height=100
-        )
+        with col1:
+            user_query = st.text_area(
+                "Enter your question in natural language:",
+                placeholder="e.g., Show me all customers who made orders in the last 30 days",
+                height=100
+            )
     
-    with col2:
-        st.markdown("### Examples:")
-        st.markdown("""
-        - List all products with price > 100
-        - Count orders by month
-        - Find top 5 customers by revenue
-        - Show employees in Sales department
-        """)
+        with col2:
+            st.markdown("### Examples:")
+            st.markdown("""
+            - List all products with price > 100
+            - Count orders by month
+            - Find top 5 customers by revenue
+            - Show employees in Sales department
+            """)
+    
+        # Generate buttons
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            generate_clicked = st.form_submit_button("🚀 Generate SQL", type="primary", use_container_width=True)
+        with col2:
+            regenerate_clicked = st.form_submit_button("🔁 Regenerate (bypass cache)", use_container_width=True)
     
-    # Generate button
-    if st.button("🚀 Generate SQL", type="primary", use_container_width=True):
+    if generate_clicked or regenerate_clicked:
         if user_query.strip():
+            if regenerate_clicked:
+                bump_generation_version(user_query)
+            version = generation_versions().get(user_query, 0)
             with st.spinner("Generating SQL query..."):
-                query_data, query_error = make_api_request(
-                    "/generate-sql", 
-                    "POST", 
-                    {"text": user_query}
-                )
-                
-                if query_data:
-                    st.session_state.current_query = query_data
+                try:
+                    query_data = generate_sql(user_query, version, regenerate=regenerate_clicked)
+                    st.session_state.current_query = dict(query_data, query_id=new_query_id())
                     st.session_state.feedback_submitted = False
-                    st.rerun()
-                else:
-                    st.error(f"Failed to generate SQL: {query_error}")
+                except RuntimeError as e:
+                    st.error(f"Failed to generate SQL: {e}")
         else:
             st.warning("Please enter a question first!")
     
@@ -178,14 +295,14 @@ with tab1:
                     
                     if exec_data:
                         st.session_state.query_results = exec_data
-                        st.rerun()
+                        # Built once here so reruns reuse it instead of re-parsing the rows
+                        st.session_state.query_results_df = pd.DataFrame(exec_data['data']) if exec_data.get('data') else None
+                        st.session_state.result_filename = f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
                     else:
                         st.error(f"Query execution failed: {exec_error}")
         
         with col2:
-            if st.button("📋 Copy Query"):
-                st.code(query_data['generated_sql'], language='sql')
-                st.success("Query copied to clipboard!")
+            copy_button(query_data['generated_sql'])
         
         # Feedback section
         if not st.session_state.feedback_submitted:
@@ -207,7 +324,6 @@ with tab1:
                     if result:
                         st.success("✅ Positive feedback submitted!")
                         st.session_state.feedback_submitted = True
-                        st.rerun()
                     else:
                         st.error(f"Failed to submit feedback: {error}")
             
@@ -236,7 +352,8 @@ with tab1:
                         if result:
                             st.success("✅ Feedback with corrections submitted!")
                             st.session_state.feedback_submitted = True
-                            st.rerun()
+                            # Stop serving the rejected SQL for this question to every session
+                            bump_generation_version(query_data['natural_language'])
                         else:
                             st.error(f"Failed to submit feedback: {error}")
         
@@ -249,16 +366,15 @@ with tab1:
             
             if results['success']:
                 if 'data' in results and results['data']:
-                    df = pd.DataFrame(results['data'])
+                    df = st.session_state.query_results_df
                     st.dataframe(df, use_container_width=True)
                     st.info(f"Returned {results['row_count']} rows")
                     
                     # Download option
-                    csv = df.to_csv(index=False)
                     st.download_button(
                         label="📥 Download as CSV",
-                        data=csv,
-                        file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        data=df_to_csv_bytes(df),
+                        file_name=st.session_state.result_filename,
                         mime="text/csv"
                     )
                 else:
@@ -266,39 +382,39 @@ with tab1:
             else:
                 st.error("Query execution failed")
 
-with tab2:
+if active_tab == SECTIONS[1]:
     st.header("📊 Database Schema")
     
     with st.spinner("Loading database schema..."):
-        schema_data, schema_error = make_api_request("/schema")
+        schema_data, schema_error = cached_request(fetch_schema)
         
         if schema_data:
             st.success(f"Found {len(schema_data['tables'])} tables")
             
-            for table in schema_data['tables']:
-                with st.expander(f"📋 Table: {table['table_name']}"):
-                    columns_df = pd.DataFrame(table['columns'])
+            for table_name, columns_df in build_schema_frames(schema_data):
+                with st.expander(f"📋 Table: {table_name}"):
                     st.dataframe(columns_df, use_container_width=True)
         else:
             st.error(f"Failed to load schema: {schema_error}")
 
-with tab3:
+if active_tab == SECTIONS[2]:
     st.header("📈 Query Analytics")
     
     # Refresh button
     if st.button("🔄 Refresh Data"):
+        fetch_sidebar.clear()
         st.rerun()
     
-    # Get statistics
-    stats_data, stats_error = make_api_request("/feedback-stats")
+    # Get statistics (the sidebar's cached response, so no request of its own)
+    stats_data, stats_error = sidebar_data["stats"]
     
     if stats_data:
+        feedback_df, recent_df = build_stats_frames(stats_data)
+        
         # Feedback distribution
         if stats_data.get('statistics'):
             st.subheader("👍👎 Feedback Distribution")
             
-            feedback_df = pd.DataFrame(stats_data['statistics'])
-            
             col1, col2 = st.columns(2)
             with col1:
                 st.bar_chart(
@@ -317,12 +433,11 @@ with tab3:
         # Recent feedback
         if stats_data.get('recent_feedback'):
             st.subheader("🕒 Recent Feedback")
-            recent_df = pd.DataFrame(stats_data['recent_feedback'])
             st.dataframe(recent_df, use_container_width=True)
     else:
         st.error(f"Failed to load analytics: {stats_error}")
 
-with tab4:
+if active_tab == SECTIONS[3]:
     st.header("⚙️ Settings & Configuration")
     
     st.subheader("🔧 System Configuration")